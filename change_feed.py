@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Change feed between scraper runs
+Compares the current crawl with the previous state by item id and
+content hash and appends only new, removed and price-changed listings to
+a JSONL feed. State is kept as a JSONL file sorted by item id, so each
+run is a single streaming merge; snapshots too large for memory are
+sorted in runs on disk and merged with heapq.merge.
+
+Usage:
+    python change_feed.py previous.json current.json [changes.jsonl]
+"""
+
+import hashlib
+import heapq
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+from itertools import islice
+
+from listing_utils import item_id
+
+HASHED_FIELDS = ('title', 'price', 'location', 'image_url')
+
+
+def content_hash(listing):
+    """Hash of the fields that make up a listing's visible content"""
+    content = '\x1f'.join(str(listing.get(field, '')) for field in HASHED_FIELDS)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def state_record(listing):
+    """Compact per-listing state kept between runs"""
+    return {
+        'item_id': item_id(listing),
+        'hash': content_hash(listing),
+        'title': listing.get('title', 'N/A'),
+        'price': listing.get('price', 'N/A'),
+        'url': listing.get('url', 'N/A'),
+    }
+
+
+def read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_listings(path):
+    """Listings from a results JSON file or a JSONL file"""
+    if path.endswith('.jsonl'):
+        yield from read_jsonl(path)
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from json.load(f).get('listings', [])
+
+
+def sorted_records(records, run_size=100000, tmp_dir=None):
+    """Yield state records sorted by item id, spilling sorted runs to disk"""
+    records = iter(records)
+    run_files = []
+    try:
+        while True:
+            run = sorted(islice(records, run_size), key=lambda record: record['item_id'])
+            if not run:
+                break
+            if not run_files and len(run) < run_size:
+                # Everything fit in one run, no need to touch the disk
+                yield from run
+                return
+            run_file = tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', suffix='.jsonl', dir=tmp_dir, delete=False)
+            with run_file:
+                for record in run:
+                    run_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            run_files.append(run_file.name)
+
+        runs = [read_jsonl(path) for path in run_files]
+        yield from heapq.merge(*runs, key=lambda record: record['item_id'])
+    finally:
+        for path in run_files:
+            os.remove(path)
+
+
+def unique_by_id(records):
+    """Drop repeated item ids from a sorted stream, keeping the first"""
+    last_id = None
+    for record in records:
+        if record['item_id'] != last_id:
+            last_id = record['item_id']
+            yield record
+
+
+def merge_diff(previous, current):
+    """Yield (change, record, old record) from two id-sorted record streams"""
+    previous = unique_by_id(previous)
+    current = unique_by_id(current)
+    old = next(previous, None)
+    new = next(current, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old['item_id'] < new['item_id']):
+            yield 'removed', old, None
+            old = next(previous, None)
+        elif old is None or new['item_id'] < old['item_id']:
+            yield 'new', new, None
+            new = next(current, None)
+        else:
+            if new['hash'] != old['hash'] and new['price'] != old['price']:
+                yield 'price_changed', new, old
+            else:
+                yield 'unchanged', new, old
+            old = next(previous, None)
+            new = next(current, None)
+
+
+def feed_entry(change, record, old_record, detected_at):
+    entry = {
+        'change': change,
+        'item_id': record['item_id'],
+        'title': record['title'],
+        'price': record['price'],
+        'url': record['url'],
+        'detected_at': detected_at,
+    }
+    if old_record is not None:
+        entry['old_price'] = old_record['price']
+    return entry
+
+
+class ChangeFeed:
+    def __init__(self, state_file='listings_state.jsonl', feed_file='olx_changes.jsonl',
+                 run_size=100000):
+        self.state_file = state_file
+        self.feed_file = feed_file
+        self.run_size = run_size
+
+    def update(self, listings, complete=False, seen_ids=()):
+        """Diff a crawl against the stored state, append changes and save the new state
+
+        Only a complete crawl (every page fetched) can tell that a listing
+        is gone; after a partial one, listings it did not see are kept in
+        the state as unchanged instead of being reported as removed.
+        seen_ids are item ids the crawl saw but did not keep (e.g. dropped
+        by the relevance filter); they are never reported as removed either.
+        Returns a dict of counts per change type.
+        """
+        detected_at = datetime.now().isoformat()
+        current = sorted_records((state_record(listing) for listing in listings), self.run_size)
+        previous = read_jsonl(self.state_file) if os.path.exists(self.state_file) else iter(())
+
+        counts = {'new': 0, 'removed': 0, 'price_changed': 0, 'unchanged': 0}
+        tmp_state = self.state_file + '.tmp'
+        with open(tmp_state, 'w', encoding='utf-8') as state, \
+                open(self.feed_file, 'a', encoding='utf-8') as feed:
+            for change, record, old_record in merge_diff(previous, current):
+                if change == 'removed' and (not complete or record['item_id'] in seen_ids):
+                    change = 'unchanged'
+                counts[change] += 1
+                if change != 'removed':
+                    state.write(json.dumps(record, ensure_ascii=False) + '\n')
+                if change != 'unchanged':
+                    entry = feed_entry(change, record, old_record, detected_at)
+                    feed.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_state, self.state_file)
+        return counts
+
+
+def diff_snapshots(previous_path, current_path, feed_path, run_size=100000):
+    """Write the change feed between two saved snapshots"""
+    previous = sorted_records((state_record(l) for l in read_listings(previous_path)), run_size)
+    current = sorted_records((state_record(l) for l in read_listings(current_path)), run_size)
+    detected_at = datetime.now().isoformat()
+
+    counts = {'new': 0, 'removed': 0, 'price_changed': 0, 'unchanged': 0}
+    with open(feed_path, 'w', encoding='utf-8') as feed:
+        for change, record, old_record in merge_diff(previous, current):
+            counts[change] += 1
+            if change != 'unchanged':
+                entry = feed_entry(change, record, old_record, detected_at)
+                feed.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return counts
+
+
+def print_counts(counts):
+    print(f"🆕 New: {counts['new']}  🗑️  Removed: {counts['removed']}  "
+          f"💱 Price changed: {counts['price_changed']}  (unchanged: {counts['unchanged']})")
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python change_feed.py previous.json current.json [changes.jsonl]")
+        return
+    feed_path = sys.argv[3] if len(sys.argv) > 3 else 'olx_changes.jsonl'
+    counts = diff_snapshots(sys.argv[1], sys.argv[2], feed_path)
+    print_counts(counts)
+    print(f"💾 Changes written to {feed_path}")
+
+
+if __name__ == "__main__":
+    main()
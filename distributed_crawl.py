@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+"""
+Distributed crawl mode for the enhanced OLX scraper
+A coordinator puts (query, page) tasks on a SQLite work queue. Worker
+processes lease tasks, fetch and parse the page and push the listings to
+a sink table. Leases expire after a visibility timeout, so tasks held by
+a dead worker are handed to another one; failed tasks are retried up to
+max_attempts times.
+
+Workers on the same machine open the database directly. SQLite's WAL
+mode does not work over network filesystems, so other nodes go through
+`serve`, a small HTTP front end to the queue on the coordinator node,
+and pass its URL as --db.
+
+Usage:
+    python distributed_crawl.py enqueue --query car-cover [--pages 10]
+    python distributed_crawl.py worker --workers 4
+    python distributed_crawl.py serve --port 8765        # on the coordinator
+    python distributed_crawl.py --db http://coordinator:8765 worker --workers 4
+    python distributed_crawl.py status
+    python distributed_crawl.py export olx_car_cover_results.json
+    python distributed_crawl.py bench --workers 1 2 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+
+import requests
+from bs4 import BeautifulSoup
+
+from identity_pool import looks_blocked
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    query TEXT,
+    page INTEGER,
+    status TEXT DEFAULT 'pending',
+    attempts INTEGER DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    UNIQUE (query, page)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_expires);
+
+CREATE TABLE IF NOT EXISTS results (
+    task_id INTEGER,
+    query TEXT,
+    page INTEGER,
+    listing TEXT
+);
+"""
+
+
+class TaskQueue:
+    """SQLite work queue with leases, for processes on the same machine
+
+    Other nodes reach it through QueueServer / RemoteQueue.
+    """
+
+    def __init__(self, db_path='crawl_queue.db', visibility_timeout=120, max_attempts=3):
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, query, pages):
+        """Add (query, page) tasks, ignoring ones already queued"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO tasks (query, page) VALUES (?, ?)",
+            [(query, page) for page in pages])
+        self.conn.execute("COMMIT")
+
+    def lease(self, worker_id):
+        """Claim the next pending or expired task, or None when nothing is left"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.expire_leases(now)
+            row = self.conn.execute("""
+                SELECT id, query, page, attempts FROM tasks
+                WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                  AND attempts < ?
+                ORDER BY page, id LIMIT 1
+            """, (now, self.max_attempts)).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute("""
+                UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?,
+                    attempts = attempts + 1
+                WHERE id = ?
+            """, (worker_id, now + self.visibility_timeout, row[0]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return {'id': row[0], 'query': row[1], 'page': row[2], 'attempts': row[3] + 1,
+                'worker': worker_id}
+
+    def expire_leases(self, now=None):
+        """Mark expired leases on their last attempt as failed; nobody will retry them"""
+        self.conn.execute("""
+            UPDATE tasks SET status = 'failed', lease_expires = NULL,
+                last_error = COALESCE(last_error, 'lease expired')
+            WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+        """, (now or time.time(), self.max_attempts))
+
+    def extend_lease(self, task):
+        """Push a held lease's expiry a full visibility timeout ahead
+
+        Returns False when the lease was already lost to another worker.
+        """
+        cursor = self.conn.execute("""
+            UPDATE tasks SET lease_expires = ?
+            WHERE id = ? AND worker = ? AND status = 'leased'
+        """, (time.time() + self.visibility_timeout, task['id'], task['worker']))
+        return cursor.rowcount > 0
+
+    def claim(self, query, page, worker_id):
+        """Lease one specific pending task, or None if it is not pending"""
+        now = time.time()
+        cursor = self.conn.execute("""
+            UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?,
+                attempts = attempts + 1
+            WHERE query = ? AND page = ? AND status = 'pending'
+        """, (worker_id, now + self.visibility_timeout, query, page))
+        if cursor.rowcount == 0:
+            return None
+        row = self.conn.execute(
+            "SELECT id, attempts FROM tasks WHERE query = ? AND page = ?", (query, page)).fetchone()
+        return {'id': row[0], 'query': query, 'page': page, 'attempts': row[1], 'worker': worker_id}
+
+    def complete(self, task, listings):
+        """Push a task's listings to the sink and mark it done
+
+        Returns False without writing anything when the lease was lost to
+        another worker.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = self.conn.execute("""
+                UPDATE tasks SET status = 'done', lease_expires = NULL
+                WHERE id = ? AND worker = ? AND status = 'leased'
+            """, (task['id'], task['worker']))
+            if cursor.rowcount == 0:
+                self.conn.execute("ROLLBACK")
+                return False
+            self.conn.execute("DELETE FROM results WHERE task_id = ?", (task['id'],))
+            self.conn.executemany(
+                "INSERT INTO results (task_id, query, page, listing) VALUES (?, ?, ?, ?)",
+                [(task['id'], task['query'], task['page'], json.dumps(listing, ensure_ascii=False))
+                 for listing in listings])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def fail(self, task, error):
+        """Release a task for retry, or mark it failed after max_attempts
+
+        Returns False when the lease was lost to another worker.
+        """
+        status = 'failed' if task['attempts'] >= self.max_attempts else 'pending'
+        cursor = self.conn.execute("""
+            UPDATE tasks SET status = ?, lease_expires = NULL, last_error = ?
+            WHERE id = ? AND worker = ? AND status = 'leased'
+        """, (status, str(error)[:500], task['id'], task['worker']))
+        return cursor.rowcount > 0
+
+    def cancel_after(self, query, page):
+        """Skip pending tasks past an empty results page"""
+        self.conn.execute(
+            "UPDATE tasks SET status = 'skipped' WHERE query = ? AND page > ? AND status = 'pending'",
+            (query, page))
+
+    def remaining(self):
+        """Tasks that are pending or leased and can still finish"""
+        # After the sweep, a lease on a last attempt is still held by a live
+        # worker, and the others must keep polling in case that worker dies
+        self.expire_leases()
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+    def stats(self):
+        self.expire_leases()
+        counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status"))
+        counts['listings'] = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return counts
+
+    def queries(self):
+        """Distinct queries that have listings in the sink"""
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT query FROM results ORDER BY query")]
+
+    def results(self, query=None):
+        """Yield listings from the sink, page by page"""
+        sql = "SELECT page, listing FROM results"
+        params = ()
+        if query:
+            sql += " WHERE query = ?"
+            params = (query,)
+        sql += " ORDER BY page, rowid"
+        for page, listing in self.conn.execute(sql, params):
+            yield page, json.loads(listing)
+
+
+# TaskQueue methods a RemoteQueue may call on the coordinator
+QUEUE_METHODS = ('enqueue', 'lease', 'extend_lease', 'claim', 'complete', 'fail', 'cancel_after',
+                 'remaining', 'stats', 'queries', 'results')
+
+
+class QueueHandler(BaseHTTPRequestHandler):
+    """POST /<method> with a JSON list of arguments; answers {"result": ...}"""
+    queue = None
+
+    def do_POST(self):
+        method = self.path.strip('/')
+        if method not in QUEUE_METHODS:
+            self.send_error(404)
+            return
+        try:
+            args = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'[]')
+            result = getattr(self.queue, method)(*args)
+            if method == 'results':
+                result = list(result)
+            status, body = 200, {'result': result}
+        except Exception as e:
+            status, body = 500, {'error': str(e)}
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_queue(db_path, host='0.0.0.0', port=8765, visibility_timeout=120, max_attempts=3):
+    """Expose a TaskQueue over HTTP so workers on other nodes can share it
+
+    Requests are handled one at a time on a single connection, which is
+    what SQLite wants; each call is a few milliseconds of local I/O.
+    """
+    QueueHandler.queue = TaskQueue(db_path, visibility_timeout, max_attempts)
+    server = HTTPServer((host, port), QueueHandler)
+    print(f"🛰️  Serving {db_path} on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        QueueHandler.queue.close()
+
+
+class RemoteQueue:
+    """TaskQueue stand-in that forwards every call to a `serve` coordinator
+
+    Visibility timeout and max attempts are the coordinator's settings.
+    """
+
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def call(self, method, *args):
+        response = self.session.post(
+            f"{self.url}/{method}", data=json.dumps(args, default=str), timeout=self.timeout)
+        if response.status_code != 200:
+            try:
+                error = response.json()['error']
+            except ValueError:
+                error = response.text[:200]
+            raise RuntimeError(f"queue {method} failed: {error}")
+        return response.json()['result']
+
+    def __getattr__(self, method):
+        if method not in QUEUE_METHODS:
+            raise AttributeError(method)
+        return lambda *args: self.call(method, *args)
+
+    def close(self):
+        self.session.close()
+
+
+def open_queue(location, visibility_timeout=120, max_attempts=3):
+    """TaskQueue for a database path, RemoteQueue for a coordinator URL"""
+    if location.startswith(('http://', 'https://')):
+        return RemoteQueue(location)
+    return TaskQueue(location, visibility_timeout, max_attempts)
+
+
+class LeaseLost(RuntimeError):
+    pass
+
+
+def lease_keeper(queue, task):
+    """on_attempt hook that renews the task's lease between fetch attempts"""
+    def renew():
+        if not queue.extend_lease(task):
+            raise LeaseLost(f"lease on page {task['page']} was taken over")
+    return renew
+
+
+def make_scraper(query, base_url=None):
+    """Enhanced scraper pointed at a search query (and optionally another host)"""
+    from olx_scraper_enhanced import EnhancedOLXScraper
+
+    scraper = EnhancedOLXScraper(query=query.replace('-', ' '))
+    if base_url:
+        scraper.base_url = base_url.rstrip('/')
+    scraper.search_url = f"{scraper.base_url}/items/q-{query}"
+    return scraper
+
+
+def run_worker(db_path, base_url=None, delay=(3, 6), visibility_timeout=120, max_attempts=3,
+               poll_interval=0.5, workdir=None):
+    """Lease and process tasks until the queue is drained
+
+    With workdir set, the worker's archive, selector cache and SQLite
+    stores are created there instead of in the current directory.
+    """
+    if not db_path.startswith(('http://', 'https://')):
+        db_path = os.path.abspath(db_path)
+    if workdir:
+        os.chdir(workdir)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    queue = open_queue(db_path, visibility_timeout, max_attempts)
+    scrapers = {}
+    processed = 0
+
+    while True:
+        task = queue.lease(worker_id)
+        if task is None:
+            if queue.remaining() == 0:
+                break
+            # Other workers hold the remaining leases; wait in case one dies
+            time.sleep(poll_interval)
+            continue
+
+        scraper = scrapers.get(task['query'])
+        if scraper is None:
+            scraper = scrapers[task['query']] = make_scraper(task['query'], base_url)
+            # One attempt plus the quarantine wait must fit inside a lease
+            scraper.max_quarantine_wait = min(scraper.max_quarantine_wait, visibility_timeout / 2)
+        scraper.on_attempt = lease_keeper(queue, task)
+
+        print(f"\n👷 {worker_id} page {task['page']} of '{task['query']}' (attempt {task['attempts']})")
+        try:
+            response = scraper.get_page_with_fallbacks(scraper.page_url(task['page']))
+            if not response:
+                raise RuntimeError("failed to fetch page with all methods")
+            listings = scraper.parse_page(BeautifulSoup(response.content, 'html.parser'))
+            if not listings and looks_blocked(response):
+                # Retry bot walls; only a real empty page may cancel later pages
+                raise RuntimeError("page looks like a CAPTCHA or bot wall")
+            if listings is None and task['page'] == 1:
+                raise RuntimeError("no listing cards found")
+            scraper.page_archive.append(response.url, response.content, task['page'])
+        except LeaseLost as e:
+            print(f"   ⚠️  {e}, moving on")
+            continue
+        except Exception as e:
+            print(f"   ❌ Task failed: {e}")
+            queue.fail(task, e)
+            continue
+
+        if not queue.complete(task, listings or []):
+            print(f"   ⚠️  Lease on page {task['page']} expired and was taken over, dropping results")
+            continue
+        if not listings:
+            print(f"   📭 Page {task['page']} is empty, skipping later pages")
+            queue.cancel_after(task['query'], task['page'])
+            continue
+
+        processed += 1
+        if delay and delay[1] > 0:
+            scraper.random_delay(*delay)
+
+    queue.close()
+    return processed
+
+
+def enqueue_search(db_path, query, max_pages=None):
+    """Fetch the first page, queue every discovered page and store page 1's listings"""
+    queue = open_queue(db_path)
+    scraper = make_scraper(query)
+    response = scraper.get_page_with_fallbacks(scraper.page_url(1))
+    planned = scraper.plan_page_urls(response.text if response else None, max_pages)
+    queue.enqueue(query, [1] + [page for page, _ in planned])
+
+    listings = scraper.parse_page(BeautifulSoup(response.content, 'html.parser')) if response else None
+    if listings is not None:
+        # Page 1 is already in hand, so no worker needs to fetch it again
+        task = queue.claim(query, 1, f"coordinator:{socket.gethostname()}:{os.getpid()}")
+        if task is not None and queue.complete(task, listings):
+            scraper.page_archive.append(response.url, response.content, 1)
+    stats = queue.stats()
+    queue.close()
+    return stats
+
+
+def start_workers(count, db_path, **worker_kwargs):
+    """Run `count` worker processes on this node and wait for them"""
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(db_path,), kwargs=worker_kwargs)
+        for _ in range(count)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def export_results(db_path, filename, query=None):
+    """Run the per-page pipeline over the sink and save one results file per query
+
+    Each query is scored with its own relevance scorer. With several queries
+    in the sink and no --query, files are named <filename stem>_<query>.json.
+    """
+    queue = open_queue(db_path)
+    queries = [query] if query else queue.queries()
+
+    exported = []
+    for current_query in queries:
+        scraper = make_scraper(current_query)
+        pages = {}
+        for page, listing in queue.results(current_query):
+            pages.setdefault(page, []).append(listing)
+
+        query_listings = []
+        for page in sorted(pages):
+            query_listings.extend(scraper.process_page(pages[page]))
+
+        if len(queries) > 1:
+            stem, ext = os.path.splitext(filename)
+            query_filename = f"{stem}_{current_query}{ext or '.json'}"
+        else:
+            query_filename = filename
+        scraper.save_to_json(query_listings, query_filename)
+        exported.extend(query_listings)
+    queue.close()
+    return exported
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves a saved results page for every path after a fixed latency"""
+    body = b''
+    latency = 0.2
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def benchmark(worker_counts, pages=40, latency=0.2, fixture='debug_page_1.html'):
+    """Measure pages/s for each worker count against a local stub server
+
+    Each run works in a temporary directory, so the real page archive,
+    selector cache and SQLite stores are left alone.
+    """
+    with open(fixture, 'rb') as f:
+        StubHandler.body = f.read()
+    StubHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    timings = {}
+    for count in worker_counts:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'queue.db')
+            queue = TaskQueue(db_path)
+            queue.enqueue('car-cover', range(1, pages + 1))
+            queue.close()
+
+            start_time = time.time()
+            # Keep the bench's archive and stores out of the real ones
+            start_workers(count, db_path, base_url=base_url, delay=None, workdir=tmp_dir)
+            timings[count] = time.time() - start_time
+
+    server.shutdown()
+    print(f"\n{'='*50}")
+    print(f"⚡ {pages} pages, {latency:.2f}s stub latency")
+    base_rate = pages / timings[worker_counts[0]]
+    for count in worker_counts:
+        rate = pages / timings[count]
+        print(f"   {count} worker(s): {rate:.1f} pages/s ({rate / base_rate:.2f}x)")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed OLX crawl")
+    parser.add_argument('--db', default='crawl_queue.db',
+                        help='queue database, or the URL of a `serve` coordinator')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = commands.add_parser('enqueue', help='queue search result pages')
+    enqueue_parser.add_argument('--query', default='car-cover')
+    enqueue_parser.add_argument('--pages', type=int,
+                                help='max pages (default: every page the search reports)')
+
+    worker_parser = commands.add_parser('worker', help='process queued pages')
+    worker_parser.add_argument('--workers', type=int, default=1)
+    worker_parser.add_argument('--base-url', help='fetch from another host, e.g. a stub server')
+    worker_parser.add_argument('--delay', type=float, nargs=2, default=(3, 6))
+    worker_parser.add_argument('--visibility-timeout', type=float, default=120)
+    worker_parser.add_argument('--max-attempts', type=int, default=3)
+
+    serve_parser = commands.add_parser('serve', help='share the queue with other nodes over HTTP')
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--visibility-timeout', type=float, default=120)
+    serve_parser.add_argument('--max-attempts', type=int, default=3)
+
+    commands.add_parser('status', help='show queue status')
+
+    export_parser = commands.add_parser('export', help='save crawled listings')
+    export_parser.add_argument('filename', nargs='?', default='olx_car_cover_results.json')
+    export_parser.add_argument('--query')
+
+    bench_parser = commands.add_parser('bench', help='throughput against a local stub server')
+    bench_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    bench_parser.add_argument('--pages', type=int, default=40)
+    bench_parser.add_argument('--latency', type=float, default=0.2)
+
+    args = parser.parse_args()
+
+    if args.command == 'enqueue':
+        stats = enqueue_search(args.db, args.query, args.pages)
+        print(f"📥 Queued pages for '{args.query}' ({stats})")
+    elif args.command == 'worker':
+        start_workers(args.workers, args.db, base_url=args.base_url, delay=tuple(args.delay),
+                      visibility_timeout=args.visibility_timeout, max_attempts=args.max_attempts)
+        print(f"✅ Workers finished at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    elif args.command == 'serve':
+        serve_queue(args.db, args.host, args.port, args.visibility_timeout, args.max_attempts)
+    elif args.command == 'status':
+        queue = open_queue(args.db)
+        print(f"📊 Queue status: {queue.stats()}")
+        queue.close()
+    elif args.command == 'export':
+        listings = export_results(args.db, args.filename, args.query)
+        print(f"🎉 Exported {len(listings)} listings")
+    elif args.command == 'bench':
+        benchmark(args.workers, pages=args.pages, latency=args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Identity pool for the enhanced OLX scraper
+An identity is a header profile plus an optional egress proxy, with its
+own requests session and cookie jar. The pool tracks latency and block
+rate per identity, routes each request to the healthiest one and
+quarantines identities that keep getting blocked.
+
+Extra identities can be listed in identities.json:
+    [{"name": "proxy-1", "user_agent": "Mozilla/5.0 ...", "proxy": "http://10.0.0.5:3128"}]
+
+`python identity_pool.py --check` routes requests through local stub
+proxies (one blocked, one slow, one fast) and checks where they settle.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+BASE_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Cache-Control': 'max-age=0',
+}
+
+DEFAULT_PROFILES = [
+    {
+        'name': 'chrome-windows',
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'headers': {
+            'sec-ch-ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
+            'sec-ch-ua-mobile': '?0',
+            'sec-ch-ua-platform': '"Windows"',
+        },
+    },
+    {
+        'name': 'safari-mac',
+        'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.1 Safari/605.1.15',
+    },
+    {
+        'name': 'firefox-linux',
+        'user_agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    },
+]
+
+BLOCK_MARKERS = ['captcha', 'access denied']
+
+# Seconds a blocked request costs on top of its latency (retry plus backoff)
+BLOCK_PENALTY = 5.0
+
+
+def looks_blocked(response):
+    """True for responses that signal throttling or a bot wall"""
+    if response.status_code in (403, 429):
+        return True
+    if response.status_code == 200 and len(response.content) <= 1000:
+        return True
+    content_lower = response.text[:20000].lower()
+    return any(marker in content_lower for marker in BLOCK_MARKERS)
+
+
+class Identity:
+    def __init__(self, name, user_agent, proxy=None, headers=None):
+        self.name = name
+        self.proxy = proxy
+        self.session = requests.Session()
+        self.session.headers.update(BASE_HEADERS)
+        self.session.headers.update(headers or {})
+        self.session.headers['User-Agent'] = user_agent
+        self.session.max_redirects = 10
+        if proxy:
+            self.session.proxies.update({'http': proxy, 'https': proxy})
+
+        self.requests = 0
+        self.blocks = 0
+        self.latency = None
+        self.block_rate = 0.0
+        self.last_blocked = False
+        self.quarantined_until = 0.0
+        self.quarantine_count = 0
+
+    def __repr__(self):
+        return f"Identity({self.name!r})"
+
+    def is_quarantined(self, now=None):
+        return (now or time.time()) < self.quarantined_until
+
+    def is_healthy(self, now=None):
+        """Usable right away without backing off first"""
+        return not self.is_quarantined(now) and not self.last_blocked
+
+    def health_score(self):
+        """Lower is better: expected seconds per request including blocks"""
+        latency = self.latency if self.latency is not None else 1.0
+        return latency + self.block_rate * BLOCK_PENALTY
+
+
+class IdentityPool:
+    def __init__(self, identities=None, config_file='identities.json', alpha=0.3,
+                 quarantine_threshold=0.5, min_requests=3, quarantine_seconds=60):
+        self.alpha = alpha
+        self.quarantine_threshold = quarantine_threshold
+        self.min_requests = min_requests
+        self.quarantine_seconds = quarantine_seconds
+        if identities is None:
+            identities = [self.make_identity(profile) for profile in DEFAULT_PROFILES]
+            identities.extend(self.load_config(config_file))
+        self.identities = identities
+
+    def make_identity(self, profile):
+        return Identity(profile['name'], profile['user_agent'],
+                        proxy=profile.get('proxy'), headers=profile.get('headers'))
+
+    def load_config(self, config_file):
+        """Extra identities (typically with proxies) from a JSON file"""
+        if not config_file or not os.path.exists(config_file):
+            return []
+        try:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                return [self.make_identity(profile) for profile in json.load(f)]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Ignoring invalid identity config {config_file}: {e}")
+            return []
+
+    def ranked(self):
+        """Usable identities, healthiest first; quarantined ones last by release time"""
+        now = time.time()
+        healthy = [identity for identity in self.identities if not identity.is_quarantined(now)]
+        # Untried identities first so every one gets measured
+        healthy.sort(key=lambda identity: (identity.requests > 0, identity.health_score()))
+        quarantined = sorted(
+            (identity for identity in self.identities if identity.is_quarantined(now)),
+            key=lambda identity: identity.quarantined_until)
+        return healthy + quarantined
+
+    def choose(self):
+        return self.ranked()[0]
+
+    def acquire(self, max_wait=None):
+        """Healthiest identity, sleeping out its quarantine if every identity is quarantined
+
+        Returns None instead of sleeping longer than max_wait seconds.
+        """
+        identity = self.choose()
+        wait = identity.quarantined_until - time.time()
+        if wait > 0:
+            if max_wait is not None and wait > max_wait:
+                print(f"   🚧 All identities quarantined for another {wait:.0f}s, giving up")
+                return None
+            print(f"   🚧 All identities quarantined, waiting {wait:.0f}s for '{identity.name}'")
+            time.sleep(wait)
+        return identity
+
+    def record(self, identity, latency, blocked):
+        """Update an identity's health after a request"""
+        identity.requests += 1
+        identity.blocks += int(blocked)
+        identity.last_blocked = blocked
+        if latency is not None:
+            if identity.latency is None:
+                identity.latency = latency
+            else:
+                identity.latency += self.alpha * (latency - identity.latency)
+        if identity.requests == 1:
+            # Like latency, the first sample sets the rate outright
+            identity.block_rate = float(blocked)
+        else:
+            identity.block_rate += self.alpha * (float(blocked) - identity.block_rate)
+
+        if (blocked and identity.requests >= self.min_requests
+                and identity.block_rate >= self.quarantine_threshold):
+            identity.quarantine_count += 1
+            # Back off harder each time the same identity is quarantined
+            duration = self.quarantine_seconds * (2 ** (identity.quarantine_count - 1))
+            identity.quarantined_until = time.time() + duration
+            print(f"   🚧 Quarantining identity '{identity.name}' for {duration:.0f}s "
+                  f"(block rate {identity.block_rate:.0%})")
+        elif not blocked:
+            identity.quarantine_count = 0
+
+    def summary(self):
+        """One line per identity with its health statistics"""
+        lines = []
+        for identity in self.identities:
+            latency = f"{identity.latency:.2f}s" if identity.latency is not None else 'n/a'
+            state = 'quarantined' if identity.is_quarantined() else 'active'
+            lines.append(f"{identity.name}: {identity.requests} requests, "
+                         f"{identity.blocks} blocked, latency {latency}, "
+                         f"block rate {identity.block_rate:.0%}, {state}")
+        return lines
+
+
+class StubProxyHandler(BaseHTTPRequestHandler):
+    """Plain HTTP proxy stand-in: answers every request itself with a fixed status and latency"""
+    status = 200
+    latency = 0.0
+    body = b'<html><body>' + b'<li data-aut-id="itemBox">listing</li>' * 100 + b'</body></html>'
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = self.body if self.status == 200 else b'Forbidden'
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_proxy(status, latency):
+    handler = type('StubProxy', (StubProxyHandler,), {'status': status, 'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stub_proxy_check(requests_count=20):
+    """Route requests through blocked, slow and fast stub proxies and check the outcome
+
+    The blocked proxy must end up quarantined and, once every identity has
+    been measured, traffic must stay on the fast one.
+    """
+    stubs = {
+        'blocked': start_stub_proxy(403, 0.0),
+        'slow': start_stub_proxy(200, 0.3),
+        'fast': start_stub_proxy(200, 0.02),
+    }
+    user_agent = DEFAULT_PROFILES[0]['user_agent']
+    identities = []
+    for name, server in stubs.items():
+        identity = Identity(name, user_agent, proxy=f"http://127.0.0.1:{server.server_address[1]}")
+        # Ignore proxy settings from the environment so the stubs see every request
+        identity.session.trust_env = False
+        identities.append(identity)
+    pool = IdentityPool(identities, min_requests=1, quarantine_seconds=60)
+
+    chosen = []
+    try:
+        for _ in range(requests_count):
+            identity = pool.acquire(max_wait=0)
+            start_time = time.time()
+            # The stub proxies answer themselves, so the target host never resolves
+            response = identity.session.get('http://olx.invalid/items/q-car-cover', timeout=5)
+            pool.record(identity, time.time() - start_time, looks_blocked(response))
+            chosen.append(identity.name)
+    finally:
+        for server in stubs.values():
+            server.shutdown()
+
+    for line in pool.summary():
+        print(f"   🪪 {line}")
+    by_name = {identity.name: identity for identity in identities}
+    assert by_name['blocked'].is_quarantined(), pool.summary()
+    assert by_name['blocked'].requests == 1, chosen
+    # After one request per identity, everything goes to the fast proxy
+    assert chosen[len(identities):] == ['fast'] * (requests_count - len(identities)), chosen
+    print("✅ Stub proxy check passed")
+    return chosen
+
+
+if __name__ == "__main__":
+    if '--check' in sys.argv:
+        stub_proxy_check()
+    else:
+        print("Usage: python identity_pool.py --check")
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Parallel thumbnail downloader with a content-addressed image store
+Images are stored once per SHA-256 of their bytes under sharded
+directories (images/ab/cd/abcd...), and a URL index lets later runs
+skip anything that was already fetched.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'image/avif,image/webp,image/apng,image/*,*/*;q=0.8',
+}
+
+
+class ImageStore:
+    def __init__(self, root='images'):
+        self.root = root
+        self.index_file = os.path.join(root, 'index.json')
+        self.lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.index = self.load_index()
+
+    def load_index(self):
+        """Load the url -> content hash index"""
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable image index {self.index_file}: {e}")
+            return {}
+
+    def save_index(self):
+        tmp_file = self.index_file + '.tmp'
+        with self.lock:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+        os.replace(tmp_file, self.index_file)
+
+    def path_for(self, digest):
+        """Sharded path for a content hash: root/ab/cd/abcd..."""
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def has_url(self, url):
+        digest = self.index.get(url)
+        return digest is not None and os.path.exists(self.path_for(digest))
+
+    def put(self, url, content):
+        """Store image bytes, returning (digest, True if the bytes were new)"""
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path_for(digest)
+        with self.lock:
+            is_new = not os.path.exists(path)
+            if is_new:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+            self.index[url] = digest
+        return digest, is_new
+
+
+class ImageDownloader:
+    def __init__(self, store, max_workers=8, timeout=15, headers=None):
+        self.store = store
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self.local = threading.local()
+
+    def get_session(self):
+        """One keep-alive session per worker thread"""
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.local.session = session
+        return session
+
+    def fetch(self, url):
+        response = self.get_session().get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def download(self, urls):
+        """Download image URLs concurrently and return run statistics"""
+        unique_urls = []
+        seen = set()
+        for url in urls:
+            if url and url != 'N/A' and url not in seen:
+                seen.add(url)
+                unique_urls.append(url)
+
+        pending = [url for url in unique_urls if not self.store.has_url(url)]
+        stats = {
+            'requested': len(unique_urls),
+            'skipped': len(unique_urls) - len(pending),
+            'downloaded': 0,
+            'stored': 0,
+            'duplicates': 0,
+            'failed': 0,
+            'bytes': 0,
+        }
+
+        start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch, url): url for url in pending}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    content = future.result()
+                except requests.RequestException as e:
+                    stats['failed'] += 1
+                    print(f"   ⚠️  Failed to fetch {url[:80]}: {str(e)[:100]}")
+                    continue
+                _, is_new = self.store.put(url, content)
+                stats['downloaded'] += 1
+                stats['bytes'] += len(content)
+                if is_new:
+                    stats['stored'] += 1
+                else:
+                    stats['duplicates'] += 1
+        elapsed = time.time() - start_time
+
+        self.store.save_index()
+        stats['seconds'] = elapsed
+        stats['images_per_second'] = stats['downloaded'] / elapsed if elapsed > 0 else 0.0
+        stats['dedup_ratio'] = stats['duplicates'] / stats['downloaded'] if stats['downloaded'] else 0.0
+        return stats
+
+
+def print_stats(stats):
+    """Print a download run summary"""
+    print(f"🖼️  Images requested: {stats['requested']}")
+    print(f"   ⏭️  Already fetched: {stats['skipped']}")
+    print(f"   📥 Downloaded: {stats['downloaded']} ({stats['bytes'] / 1024:.1f} KB)")
+    print(f"   💾 New files stored: {stats['stored']}")
+    print(f"   🔁 Duplicate content: {stats['duplicates']} (dedup ratio {stats['dedup_ratio']:.1%})")
+    print(f"   ❌ Failed: {stats['failed']}")
+    print(f"   ⚡ Throughput: {stats['images_per_second']:.1f} images/s in {stats['seconds']:.1f}s")
+
+
+def download_listing_images(listings, root='images', max_workers=8):
+    """Download thumbnails for parsed listings into the image store"""
+    downloader = ImageDownloader(ImageStore(root), max_workers=max_workers)
+    stats = downloader.download(listing.get('image_url') for listing in listings)
+    print_stats(stats)
+    return stats
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves fixed image bytes by path; unknown paths get a 404"""
+    images = {}
+
+    def do_GET(self):
+        body = self.images.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/webp')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fixture_check(copies=50):
+    """Download from a local fixture server into a temporary store and check the stats
+
+    Serves `copies` URLs for each of two distinct images plus one missing
+    URL, so a first run must store exactly 2 files and a second run must
+    skip every URL that was fetched.
+    """
+    FixtureHandler.images = {}
+    for i in range(copies):
+        FixtureHandler.images[f'/a/{i}.webp'] = b'A' * 4096
+        FixtureHandler.images[f'/b/{i}.webp'] = b'B' * 4096
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [base_url + path for path in FixtureHandler.images] + [base_url + '/missing.webp']
+
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            first = ImageDownloader(ImageStore(root)).download(urls)
+            print_stats(first)
+            assert first['downloaded'] == 2 * copies, first
+            assert first['stored'] == 2, first
+            assert first['failed'] == 1, first
+            assert abs(first['dedup_ratio'] - (copies - 1) / copies) < 1e-9, first
+
+            second = ImageDownloader(ImageStore(root)).download(urls)
+            print_stats(second)
+            assert second['skipped'] == 2 * copies, second
+            assert second['downloaded'] == 0, second
+    finally:
+        server.shutdown()
+    print("✅ Fixture check passed")
+    return first, second
+
+
+def main():
+    if '--check' in sys.argv:
+        fixture_check()
+        return
+
+    results_file = sys.argv[1] if len(sys.argv) > 1 else 'olx_car_cover_results.json'
+    root = sys.argv[2] if len(sys.argv) > 2 else 'images'
+
+    with open(results_file, 'r', encoding='utf-8') as f:
+        listings = json.load(f).get('listings', [])
+    print(f"🖼️  Downloading thumbnails for {len(listings)} listings into '{root}'...")
+    download_listing_images(listings, root=root)
+
+
+if __name__ == "__main__":
+    main()
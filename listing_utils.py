@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+Small helpers shared by the scraper pipeline stages
+"""
+
+import re
+
+ITEM_ID_PATTERN = re.compile(r'iid-(\d+)')
+
+
+def item_id(listing_or_url):
+    """OLX item id from a listing dict or URL, falling back to the URL itself"""
+    url = listing_or_url.get('url', '') if isinstance(listing_or_url, dict) else listing_or_url
+    match = ITEM_ID_PATTERN.search(url or '')
+    return match.group(1) if match else url
+
+
+def parse_price(price):
+    """Integer rupee amount from a price string like '₹ 7,500', or None"""
+    digits = re.sub(r'[^\d]', '', price or '')
+    return int(digits) if digits else None
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate listing detection with MinHash signatures and an LSH index
+Titles are shingled into character n-grams, summarised as MinHash
+signatures and banded into an on-disk SQLite LSH index, so each new
+listing is only compared against listings sharing a band bucket. Only
+original (non-duplicate) listings are bucketed, so reposts of a popular
+title do not make its buckets grow without bound.
+"""
+
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import struct
+import sys
+from array import array
+
+from listing_utils import item_id
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def normalize_title(title):
+    """Lowercase and collapse punctuation/whitespace"""
+    return ' '.join(re.findall(r'[a-z0-9]+', title.lower()))
+
+
+def shingles(title, size=3):
+    """Set of character n-grams for a title"""
+    text = normalize_title(title)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def stable_hash(value):
+    """32-bit hash that is the same in every process (unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+class MinHasher:
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def signature(self, title):
+        """MinHash signature as an array of 32-bit ints"""
+        hashes = [stable_hash(s) for s in shingles(title)]
+        if not hashes:
+            return array('I', [MAX_HASH] * self.num_perm)
+        return array('I', [
+            min((a * h + b) % MERSENNE_PRIME for h in hashes) & MAX_HASH
+            for a, b in self.permutations
+        ])
+
+
+def estimated_similarity(sig_a, sig_b):
+    """Fraction of agreeing MinHash slots, an estimate of Jaccard similarity"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    def __init__(self, db_path='near_duplicates.db', num_perm=64, bands=16, threshold=0.7,
+                 max_bucket_candidates=200):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.db_path = db_path
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_bucket_candidates = max_bucket_candidates
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                item_id TEXT PRIMARY KEY,
+                title TEXT,
+                signature BLOB,
+                duplicate_of TEXT
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                band INTEGER,
+                bucket INTEGER,
+                item_id TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_buckets ON buckets (band, bucket);
+        """)
+
+    def close(self):
+        self.conn.close()
+
+    def band_buckets(self, signature):
+        """One 64-bit bucket key per band of the signature"""
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(rows.tobytes(), digest_size=8).digest()
+            keys.append(struct.unpack('<q', digest)[0])
+        return keys
+
+    def candidates(self, buckets):
+        """(item id, signature) of listings sharing at least one band bucket
+
+        One query for all bands, reading at most max_bucket_candidates
+        (the oldest) from each bucket.
+        """
+        per_band = "SELECT item_id FROM (SELECT item_id FROM buckets WHERE band = ? AND bucket = ? LIMIT ?)"
+        sql = ("SELECT item_id, signature FROM signatures WHERE item_id IN ("
+               + " UNION ".join([per_band] * len(buckets)) + ")")
+        params = []
+        for band, bucket in enumerate(buckets):
+            params.extend((band, bucket, self.max_bucket_candidates))
+        return [(other_id, array('I', blob)) for other_id, blob in self.conn.execute(sql, params)]
+
+    def find_duplicate(self, listing_id, signature, buckets):
+        """Most similar stored listing above the threshold, or None"""
+        best_id, best_similarity = None, 0.0
+        for other_id, other_signature in self.candidates(buckets):
+            if other_id == listing_id:
+                continue
+            similarity = estimated_similarity(signature, other_signature)
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_id, best_similarity = other_id, similarity
+        return best_id
+
+    def add_page(self, listings):
+        """Check a page of listings against the index and add them
+
+        Sets listing['duplicate_of'] to the matching item id (or 'N/A')
+        and returns the number of near-duplicates found. The whole page
+        is written in one transaction.
+        """
+        duplicates = 0
+        with self.conn:
+            for listing in listings:
+                listing_id = item_id(listing)
+                known = self.conn.execute(
+                    "SELECT duplicate_of FROM signatures WHERE item_id = ?", (listing_id,)).fetchone()
+                if known:
+                    # Seen in an earlier page or run: keep the original verdict
+                    duplicate_of = known[0]
+                else:
+                    signature = self.hasher.signature(listing.get('title', ''))
+                    buckets = self.band_buckets(signature)
+                    duplicate_of = self.find_duplicate(listing_id, signature, buckets)
+                    self.conn.execute(
+                        "INSERT INTO signatures (item_id, title, signature, duplicate_of) VALUES (?, ?, ?, ?)",
+                        (listing_id, listing.get('title', ''), signature.tobytes(), duplicate_of))
+                    if not duplicate_of:
+                        # Reposts are found through their original, so only originals are bucketed
+                        self.conn.executemany(
+                            "INSERT INTO buckets (band, bucket, item_id) VALUES (?, ?, ?)",
+                            [(band, bucket, listing_id) for band, bucket in enumerate(buckets)])
+
+                listing['duplicate_of'] = duplicate_of or 'N/A'
+                if duplicate_of:
+                    duplicates += 1
+        return duplicates
+
+
+def main():
+    results_file = sys.argv[1] if len(sys.argv) > 1 else 'olx_car_cover_results.json'
+    with open(results_file, 'r', encoding='utf-8') as f:
+        listings = json.load(f).get('listings', [])
+
+    index = NearDuplicateIndex()
+    duplicates = index.add_page(listings)
+    titles = {item_id(listing): listing['title'] for listing in listings}
+    print(f"🔁 {duplicates} near-duplicate listings out of {len(listings)}")
+    for listing in listings:
+        if listing['duplicate_of'] != 'N/A':
+            original = titles.get(listing['duplicate_of'], listing['duplicate_of'])
+            print(f"   - {listing['title']}  ≈  {original}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
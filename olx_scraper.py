@@ -19,6 +19,16 @@ import sys
 import random
 from urllib.parse import urljoin
 from datetime import datetime
+from selector_engine import SelectorEngine
+from image_store import download_listing_images
+from near_duplicates import NearDuplicateIndex
+from relevance import RelevanceScorer
+from search_index import SearchIndex
+from identity_pool import looks_blocked
+from change_feed import ChangeFeed, print_counts
+from listing_utils import item_id
+from pagination import discover_page_count, plan_pages
+from page_archive import PageArchive
 
 class OLXScraper:
     def __init__(self):
@@ -38,6 +48,15 @@ class OLXScraper:
         }
         self.session = requests.Session()
         self.session.headers.update(self.headers)
+        self.selector_engine = SelectorEngine()
+        self.near_duplicates = NearDuplicateIndex()
+        self.relevance = RelevanceScorer(query='car cover')
+        self.search_index = SearchIndex()
+        self.page_archive = PageArchive()
+        # Set by scrape_search_results when every page of the search was parsed
+        self.crawl_complete = False
+        # Item ids the relevance filter dropped; the change feed counts them as seen
+        self.filtered_ids = set()
         
     def random_delay(self, min_seconds=2, max_seconds=5):
         """Add random delay to appear more human-like"""
@@ -114,14 +133,24 @@ class OLXScraper:
             print(f"Error parsing listing: {e}")
             return None
     
-    def scrape_search_results(self, max_pages=3):
-        """Scrape search results from OLX"""
+    def scrape_search_results(self, max_pages=None):
+        """Scrape search results from OLX
+        
+        The page count is read from the first response; max_pages only caps it.
+        """
         all_listings = []
+        self.crawl_complete = False
+        self.filtered_ids = set()
+        parsed_pages = set()
+        blocked_retries = set()
+        discovered_pages = None
         
         print("🔍 Starting to scrape OLX...")
         print("💡 Tip: If this fails, try using a VPN or check if OLX is accessible in your browser")
         
-        for page in range(1, max_pages + 1):
+        # The remaining pages are appended once the first response is in
+        pages = [1]
+        for page in pages:
             if page == 1:
                 url = self.search_url
             else:
@@ -141,14 +170,25 @@ class OLXScraper:
                 print("   - Check if you can access the URL in your browser")
                 print("   - Try using a VPN")
                 print("   - OLX might be temporarily blocking your IP")
+                if page == 1:
+                    pages.extend(plan_pages(None, max_pages))
                 continue
             
             # Check response content
             print(f"Response size: {len(response.content)} bytes")
+            
+            if page == 1 and len(pages) == 1:
+                discovered_pages = discover_page_count(response.text)
+                pages.extend(plan_pages(discovered_pages, max_pages))
+                if discovered_pages:
+                    print(f"📚 Search has {discovered_pages} pages, fetching {len(pages)}")
             if "blocked" in response.text.lower() or "captcha" in response.text.lower():
                 print("⚠️  Detected possible blocking or CAPTCHA")
                 print("💡 Try again later or use a different IP/VPN")
                 
+            # Keep every raw page so parser changes can be replayed offline
+            self.page_archive.append(url, response.content, page)
+            
             soup = BeautifulSoup(response.content, 'html.parser')
             
             # Debug: Save first page HTML for inspection
@@ -157,45 +197,55 @@ class OLXScraper:
                     f.write(response.text)
                 print("📄 Saved first page HTML as 'debug_page.html' for inspection")
             
-            # Find listings - OLX uses different selectors, trying common ones
-            selectors_to_try = [
-                ('div', {'data-aut-id': 'itemBox'}),
-                ('div', {'class': lambda x: x and 'EIR5N' in str(x)}),
-                ('div', {'class': lambda x: x and '_1ONrY' in str(x)}),
-                ('div', {'class': lambda x: x and 'item' in str(x).lower()}),
-                ('a', {'href': lambda x: x and '/item/' in str(x)}),
-            ]
-            
-            listings = []
-            for tag, attrs in selectors_to_try:
-                listings = soup.find_all(tag, attrs)
-                if listings:
-                    print(f"✓ Found listings using selector: {tag} with {attrs}")
-                    break
-            
-            if not listings:
+            # Find listings - the selector engine tries the last selector that
+            # worked first and falls back to a structural card search
+            listings, selector_name = self.selector_engine.find_listings(soup, self.base_url, 'search')
+            if listings:
+                print(f"✓ Found listings using selector: {selector_name}")
+            else:
                 print("❌ No listings found with any selector")
-                print("🔍 Trying to find any links that might be listings...")
-                
-                # Try to find any links that look like listings
-                all_links = soup.find_all('a', href=True)
-                listings = [link for link in all_links if '/item/' in link.get('href', '')]
-                
-                if not listings:
-                    print("📊 Page analysis:")
-                    print(f"   - Total links found: {len(all_links)}")
-                    print(f"   - Page title: {soup.title.string if soup.title else 'No title'}")
-                    print("   - This might indicate the page structure has changed")
+                print("📊 Page analysis:")
+                print(f"   - Total links found: {len(soup.find_all('a', href=True))}")
+                print(f"   - Page title: {soup.title.string if soup.title else 'No title'}")
+                print("   - This might indicate the page structure has changed")
                 
             print(f"Found {len(listings)} listings on page {page}")
+            if not listings and looks_blocked(response):
+                # A bot wall has no cards either, but it is not the end of the results
+                if page not in blocked_retries:
+                    blocked_retries.add(page)
+                    print(f"🚧 Page {page} looks like a CAPTCHA or bot wall, retrying it last")
+                    pages.append(page)
+                else:
+                    print(f"🚧 Page {page} is still blocked, giving up on it")
+                continue
+            if page > 1 and not listings:
+                print("📭 Reached an empty page, stopping")
+                break
             
+            page_listings = []
             for listing in listings:
                 parsed_listing = self.parse_listing(listing)
                 if parsed_listing and parsed_listing['title'] != 'N/A':
-                    all_listings.append(parsed_listing)
+                    page_listings.append(parsed_listing)
             
-            print(f"✅ Successfully parsed {len([l for l in all_listings if l])} listings from page {page}")
+            parsed_count = len(page_listings)
+            parsed_ids = {item_id(listing) for listing in page_listings}
+            page_listings = self.relevance.filter_page(page_listings)
+            self.filtered_ids |= parsed_ids - {item_id(listing) for listing in page_listings}
+            if len(page_listings) < parsed_count:
+                print(f"🧹 Dropped {parsed_count - len(page_listings)} irrelevant listings")
+            
+            parsed_pages.add(page)
+            duplicates = self.near_duplicates.add_page(page_listings)
+            self.search_index.add_page(page_listings)
+            all_listings.extend(page_listings)
+            print(f"✅ Successfully parsed {len(page_listings)} listings from page {page}")
+            if duplicates:
+                print(f"🔁 {duplicates} of them look like reposts of earlier listings")
         
+        self.crawl_complete = (discovered_pages is not None
+                               and parsed_pages == set(range(1, discovered_pages + 1)))
         return all_listings
     
     def save_to_json(self, listings, filename='olx_car_cover_results.json'):
@@ -260,21 +310,30 @@ def main():
     try:
         scraper = OLXScraper()
         
-        # Get max pages from user
+        # Get max pages from user; by default every page the search reports
         try:
-            max_pages = int(input("Enter number of pages to scrape (default 2): ") or "2")
-            max_pages = max(1, min(max_pages, 10))  # Limit to reasonable range
+            max_pages = int(input("Enter max number of pages to scrape (default: all): ") or "0")
+            max_pages = max(1, max_pages) if max_pages else None
         except ValueError:
-            max_pages = 2
+            max_pages = None
         
-        print(f"\nStarting scrape for {max_pages} pages...")
+        print(f"\nStarting scrape for {max_pages or 'all'} pages...")
         listings = scraper.scrape_search_results(max_pages=max_pages)
         
         if listings:
+            # Record what changed since the previous run before overwriting it
+            if not scraper.crawl_complete:
+                print("📋 Partial crawl: listings not seen this time are kept, not reported as removed")
+            print_counts(ChangeFeed().update(listings, complete=scraper.crawl_complete,
+                                             seen_ids=scraper.filtered_ids))
+            
             # Save results
             scraper.save_to_json(listings)
             scraper.save_to_csv(listings)
             scraper.print_summary(listings)
+            
+            if input("\nDownload listing thumbnails? (y/N): ").strip().lower() == 'y':
+                download_listing_images(listings)
         else:
             print("\nNo listings found. This could be due to:")
             print("1. OLX's page structure has changed")
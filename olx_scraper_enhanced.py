@@ -14,39 +14,50 @@ import random
 from urllib.parse import urljoin
 from datetime import datetime
 import urllib3
+from selector_engine import SelectorEngine
+from image_store import download_listing_images
+from near_duplicates import NearDuplicateIndex
+from relevance import RelevanceScorer
+from search_index import SearchIndex
+from identity_pool import IdentityPool, looks_blocked
+from change_feed import ChangeFeed, print_counts
+from listing_utils import item_id
+from pagination import discover_page_count, plan_pages
+from page_archive import PageArchive
 
 # Disable SSL warnings for troubleshooting
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 class EnhancedOLXScraper:
-    def __init__(self):
+    def __init__(self, query='car cover', parse_only=False):
         self.base_url = "https://www.olx.in"
-        self.search_url = "https://www.olx.in/items/q-car-cover"
+        self.search_query = query
+        self.search_url = f"{self.base_url}/items/q-{query.replace(' ', '-')}"
         
-        # More realistic browser headers
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Cache-Control': 'max-age=0',
-            'sec-ch-ua': '"Not_A Brand";v="8", "Chromium";v="120", "Google Chrome";v="120"',
-            'sec-ch-ua-mobile': '?0',
-            'sec-ch-ua-platform': '"Windows"'
-        }
+        # Longest wait for a quarantined identity before a request gives up
+        self.max_quarantine_wait = 120
+        # Called before and after waiting for an identity on every attempt;
+        # distributed workers renew their task lease here
+        self.on_attempt = None
+        # Set by scrape_search_results when every page of the search was parsed
+        self.crawl_complete = False
+        # Item ids the relevance filter dropped; the change feed counts them as seen
+        self.filtered_ids = set()
+        self.discovered_pages = None
         
-        self.session = requests.Session()
-        self.session.headers.update(self.headers)
+        if parse_only:
+            # Enough for parse_page(): no network, no stores, no cache writes
+            self.selector_engine = SelectorEngine(read_only=True)
+            return
         
-        # Configure session for better compatibility
-        self.session.max_redirects = 10
+        # Header profiles / proxies, each with its own session and cookie jar;
+        # requests go to the healthiest identity (see identity_pool.py)
+        self.identity_pool = IdentityPool()
+        self.selector_engine = SelectorEngine()
+        self.near_duplicates = NearDuplicateIndex()
+        self.relevance = RelevanceScorer(query=query)
+        self.search_index = SearchIndex()
+        self.page_archive = PageArchive()
         
     def random_delay(self, min_seconds=3, max_seconds=8):
         """Add random delay to appear more human-like"""
@@ -57,7 +68,7 @@ class EnhancedOLXScraper:
     def get_page_with_fallbacks(self, url, max_retries=3):
         """Try multiple approaches to get the page"""
         
-        # Method 1: Standard HTTPS request
+        # Method 1: Standard HTTPS request via the healthiest identities
         print(f"🔄 Method 1: Standard HTTPS request")
         response = self.try_request(url, max_retries)
         if response:
@@ -76,27 +87,28 @@ class EnhancedOLXScraper:
         if response:
             return response
             
-        # Method 4: Try with different user agent
-        print(f"🔄 Method 4: Different User-Agent")
-        old_ua = self.session.headers['User-Agent']
-        self.session.headers['User-Agent'] = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.1 Safari/605.1.15'
-        response = self.try_request(url, max_retries)
-        self.session.headers['User-Agent'] = old_ua  # Restore original
-        if response:
-            return response
-            
         return None
     
     def try_request(self, url, max_retries=3, verify_ssl=True):
-        """Try to make a request with retries"""
+        """Try to make a request with retries, each on the healthiest identity"""
         for attempt in range(max_retries):
+            if self.on_attempt:
+                self.on_attempt()
+            identity = self.identity_pool.acquire(self.max_quarantine_wait)
+            if identity is None:
+                return None
+            if self.on_attempt:
+                self.on_attempt()
+            recorded = False
+            rate_limited = False
+            start_time = time.time()
             try:
-                print(f"   📡 Attempt {attempt + 1}: {url}")
+                print(f"   📡 Attempt {attempt + 1} as '{identity.name}': {url}")
                 
                 # Progressive timeout increase
                 timeout = 15 + (attempt * 10)  # 15, 25, 35 seconds
                 
-                response = self.session.get(
+                response = identity.session.get(
                     url, 
                     timeout=timeout, 
                     verify=verify_ssl,
@@ -107,13 +119,16 @@ class EnhancedOLXScraper:
                 print(f"   ✅ Status: {response.status_code}")
                 print(f"   📦 Size: {len(response.content)} bytes")
                 
+                self.identity_pool.record(identity, time.time() - start_time, looks_blocked(response))
+                recorded = True
+                
                 if response.status_code == 200 and len(response.content) > 1000:
                     return response
                 elif response.status_code == 403:
                     print(f"   🚫 Access forbidden - likely blocked")
                 elif response.status_code == 429:
                     print(f"   ⏰ Rate limited - need to wait longer")
-                    self.random_delay(10, 20)
+                    rate_limited = True
                 else:
                     print(f"   ⚠️  Unexpected status or small response")
                 
@@ -126,7 +141,17 @@ class EnhancedOLXScraper:
             except Exception as e:
                 print(f"   ❌ Unexpected error: {str(e)[:100]}...")
             
-            if attempt < max_retries - 1:
+            if not recorded:
+                # Timeouts and connection/proxy errors count against the identity
+                self.identity_pool.record(identity, time.time() - start_time, True)
+            
+            if attempt >= max_retries - 1:
+                continue
+            if rate_limited:
+                # Rate limits usually apply to the whole client, not one identity
+                self.random_delay(10, 20)
+            elif not self.identity_pool.choose().is_healthy():
+                # Skip the backoff only when a healthy identity is ready
                 delay = (2 ** attempt) + random.uniform(2, 5)
                 print(f"   ⏳ Waiting {delay:.1f}s before retry...")
                 time.sleep(delay)
@@ -192,18 +217,74 @@ class EnhancedOLXScraper:
             print(f"   ⚠️  Error parsing listing: {e}")
             return None
     
-    def scrape_search_results(self, max_pages=2):
-        """Scrape search results from OLX with enhanced methods"""
+    def page_url(self, page):
+        """Search results URL for a 1-based page number"""
+        if page == 1:
+            return self.search_url
+        return f"{self.search_url}?page={page}"
+    
+    def plan_page_urls(self, first_page_html, max_pages=None):
+        """(page, url) for every page after the first, from the discovered page count"""
+        discovered_pages = discover_page_count(first_page_html) if first_page_html else None
+        self.discovered_pages = discovered_pages
+        if discovered_pages:
+            print(f"📚 Search reports {discovered_pages} pages of results")
+        return [(page, self.page_url(page)) for page in plan_pages(discovered_pages, max_pages)]
+    
+    def parse_page(self, soup):
+        """Parse all listings on a search results page, or None if no cards were found"""
+        # Find listings - learned selector first, structural fallback last
+        listings, selector_name = self.selector_engine.find_listings(soup, self.base_url, 'search')
+        if listings:
+            print(f"✅ Found {len(listings)} listings using: {selector_name}")
+        else:
+            print("❌ No listings found with any method")
+            print(f"📊 Page analysis:")
+            print(f"   - Total links: {len(soup.find_all('a', href=True))}")
+            print(f"   - Page title: {soup.title.string if soup.title else 'No title'}")
+            return None
+        
+        page_listings = []
+        for listing in listings:
+            parsed = self.parse_listing(listing)
+            if parsed and parsed['title'] != 'N/A':
+                page_listings.append(parsed)
+        return page_listings
+    
+    def process_page(self, page_listings):
+        """Run the per-page pipeline stages and return the listings to keep"""
+        # Drop and rank by relevance to the search query
+        parsed_count = len(page_listings)
+        parsed_ids = {item_id(listing) for listing in page_listings}
+        page_listings = self.relevance.filter_page(page_listings)
+        self.filtered_ids |= parsed_ids - {item_id(listing) for listing in page_listings}
+        if len(page_listings) < parsed_count:
+            print(f"🧹 Dropped {parsed_count - len(page_listings)} irrelevant listings")
+        
+        # Flag near-duplicate reposts (MinHash/LSH over titles)
+        duplicates = self.near_duplicates.add_page(page_listings)
+        self.search_index.add_page(page_listings)
+        if duplicates:
+            print(f"🔁 {duplicates} near-duplicate reposts flagged via 'duplicate_of'")
+        return page_listings
+    
+    def scrape_search_results(self, max_pages=None):
+        """Scrape search results from OLX with enhanced methods
+        
+        The page count is read from the first response; max_pages only caps it.
+        """
         all_listings = []
+        self.crawl_complete = False
+        self.filtered_ids = set()
+        parsed_pages = set()
+        blocked_retries = set()
         
         print("🚀 Starting enhanced OLX scraping...")
         print("💡 This version tries multiple methods to bypass blocking")
         
-        for page in range(1, max_pages + 1):
-            if page == 1:
-                url = self.search_url
-            else:
-                url = f"{self.search_url}?page={page}"
+        # The remaining pages are planned once the first response is in
+        planned = [(1, self.page_url(1))]
+        for page, url in planned:
             
             print(f"\n📄 Scraping page {page}...")
             
@@ -213,6 +294,9 @@ class EnhancedOLXScraper:
             
             response = self.get_page_with_fallbacks(url)
             
+            if page == 1 and len(planned) == 1:
+                planned.extend(self.plan_page_urls(response.text if response else None, max_pages))
+            
             if not response:
                 print(f"❌ Failed to fetch page {page} with all methods")
                 continue
@@ -222,6 +306,7 @@ class EnhancedOLXScraper:
             with open(debug_filename, 'w', encoding='utf-8') as f:
                 f.write(response.text)
             print(f"💾 Saved page {page} as '{debug_filename}' for inspection")
+            self.page_archive.append(url, response.content, page)
             
             # Check for blocking indicators
             content_lower = response.text.lower()
@@ -229,52 +314,40 @@ class EnhancedOLXScraper:
                 print("⚠️  Detected possible blocking in content")
             
             soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Try multiple selectors for listings
-            selectors_to_try = [
-                ('div', {'data-aut-id': 'itemBox'}),
-                ('div', {'class': lambda x: x and any(cls in str(x) for cls in ['EIR5N', '_1ONrY', 'item'])}),
-                ('li', {'data-aut-id': 'itemBox'}),
-                ('article', {}),
-            ]
-            
-            listings = []
-            for tag, attrs in selectors_to_try:
-                listings = soup.find_all(tag, attrs)
-                if listings:
-                    print(f"✅ Found {len(listings)} listings using: {tag} {attrs}")
-                    break
-            
-            if not listings:
-                print("🔍 Trying fallback: looking for any links with '/item/'")
-                all_links = soup.find_all('a', href=True)
-                listings = [link.parent for link in all_links if '/item/' in link.get('href', '')]
-                
-                if listings:
-                    print(f"✅ Found {len(listings)} potential listings via fallback")
+            page_listings = self.parse_page(soup)
+            if not page_listings and looks_blocked(response):
+                # A bot wall has no cards either, but it is not the end of the results
+                if page not in blocked_retries:
+                    blocked_retries.add(page)
+                    print(f"🚧 Page {page} looks like a CAPTCHA or bot wall, retrying it last")
+                    planned.append((page, url))
                 else:
-                    print("❌ No listings found with any method")
-                    print(f"📊 Page analysis:")
-                    print(f"   - Total links: {len(all_links)}")
-                    print(f"   - Page title: {soup.title.string if soup.title else 'No title'}")
-                    continue
-            
-            # Parse listings
-            page_listings = []
-            for listing in listings:
-                parsed = self.parse_listing(listing)
-                if parsed and parsed['title'] != 'N/A':
-                    page_listings.append(parsed)
+                    print(f"🚧 Page {page} is still blocked, giving up on it")
+                continue
+            if page > 1 and not page_listings:
+                print("📭 Reached an empty page, stopping")
+                break
+            if page_listings is None:
+                continue
             
+            parsed_pages.add(page)
+            page_listings = self.process_page(page_listings)
             all_listings.extend(page_listings)
             print(f"✅ Successfully parsed {len(page_listings)} listings from page {page}")
         
+        self.crawl_complete = (self.discovered_pages is not None
+                               and parsed_pages == set(range(1, self.discovered_pages + 1)))
+        
+        print("\n🪪 Identity health:")
+        for line in self.identity_pool.summary():
+            print(f"   - {line}")
+        
         return all_listings
     
     def save_to_json(self, listings, filename='olx_car_cover_results.json'):
         """Save listings to JSON file"""
         data = {
-            'search_query': 'car cover',
+            'search_query': self.search_query,
             'search_url': self.search_url,
             'scraped_at': datetime.now().isoformat(),
             'total_results': len(listings),
@@ -335,17 +408,23 @@ def main():
         
         # Get max pages from user
         try:
-            max_pages = int(input("📄 Enter number of pages to scrape (default 2): ") or "2")
-            max_pages = max(1, min(max_pages, 5))  # Limit to reasonable range
+            max_pages = int(input("📄 Enter max number of pages to scrape (default: all): ") or "0")
+            max_pages = max(1, max_pages) if max_pages else None
         except ValueError:
-            max_pages = 2
+            max_pages = None
         
-        print(f"\n🎯 Starting enhanced scrape for {max_pages} pages...")
+        print(f"\n🎯 Starting enhanced scrape for {max_pages or 'all'} pages...")
         print("💡 This may take longer but has better success rates")
         
         listings = scraper.scrape_search_results(max_pages=max_pages)
         
         if listings:
+            # Record what changed since the previous run before overwriting it
+            if not scraper.crawl_complete:
+                print("📋 Partial crawl: listings not seen this time are kept, not reported as removed")
+            print_counts(ChangeFeed().update(listings, complete=scraper.crawl_complete,
+                                             seen_ids=scraper.filtered_ids))
+            
             # Save results
             scraper.save_to_json(listings)
             scraper.save_to_csv(listings)
@@ -356,6 +435,9 @@ def main():
             print("   - olx_car_cover_results.json")
             print("   - olx_car_cover_results.csv")
             
+            if input("\n🖼️  Download listing thumbnails? (y/N): ").strip().lower() == 'y':
+                download_listing_images(listings)
+            
         else:
             print("\n❌ No listings found. Possible reasons:")
             print("1. 🚫 OLX has strong anti-bot protection for your IP")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Append-only archive of raw result pages for offline re-parsing
+Every fetched page body is appended to pages.bin as one compressed frame
+(zstd when the zstandard package is installed, zlib otherwise) and
+recorded in pages.idx with its offset. Reads go through a memory map, so
+thousands of archived pages can be re-parsed in parallel with the current
+parse_listing/selector code without touching the network.
+
+Usage:
+    python page_archive.py stats
+    python page_archive.py reparse --workers 4 --out reparsed_results.json
+"""
+
+import argparse
+import json
+import mmap
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+try:
+    import zstandard
+except ImportError:  # zlib fallback keeps the archive usable without zstd
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks on Windows; appends from one process only
+    fcntl = None
+
+DEFAULT_CODEC = 'zstd' if zstandard else 'zlib'
+
+
+def compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 6)
+
+
+def decompress(frame, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("archive contains zstd frames; install zstandard to read them")
+        return zstandard.ZstdDecompressor().decompress(frame)
+    return zlib.decompress(frame)
+
+
+class PageArchive:
+    def __init__(self, root='page_archive', codec=DEFAULT_CODEC):
+        self.root = root
+        self.codec = codec
+        self.data_file = os.path.join(root, 'pages.bin')
+        self.index_file = os.path.join(root, 'pages.idx')
+        self.map = None
+        self.map_size = 0
+        os.makedirs(root, exist_ok=True)
+
+    def append(self, url, body, page=None):
+        """Append a raw page body and return its index entry"""
+        frame = compress(body, self.codec)
+        with open(self.data_file, 'ab') as f:
+            # Workers share the archive, so the offset, frame and index line
+            # are written under one exclusive lock
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                f.write(frame)
+                f.flush()
+                entry = {
+                    'offset': offset,
+                    'length': len(frame),
+                    'codec': self.codec,
+                    'size': len(body),
+                    'url': url,
+                    'page': page,
+                    'fetched_at': datetime.now().isoformat(),
+                }
+                # The index line is written last, so a crash never indexes a partial frame
+                with open(self.index_file, 'a', encoding='utf-8') as index:
+                    index.write(json.dumps(entry) + '\n')
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+        return entry
+
+    def entries(self):
+        """All index entries in archive order"""
+        if not os.path.exists(self.index_file):
+            return []
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def read(self, entry):
+        """Decompressed body of an archived page"""
+        end = entry['offset'] + entry['length']
+        if self.map is None or end > self.map_size:
+            self.close()
+            with open(self.data_file, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.map_size = len(self.map)
+        return decompress(self.map[entry['offset']:end], entry['codec'])
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+            self.map_size = 0
+
+
+# Per-process state for parallel re-parsing
+_worker_archive = None
+_worker_scraper = None
+
+
+def init_reparse_worker(root):
+    global _worker_archive, _worker_scraper
+    from olx_scraper_enhanced import EnhancedOLXScraper
+
+    _worker_archive = PageArchive(root)
+    # Parser only: the live stores and selector cache stay untouched
+    _worker_scraper = EnhancedOLXScraper(parse_only=True)
+
+
+def reparse_entry(entry):
+    """Parse one archived page with the current extraction code"""
+    body = _worker_archive.read(entry)
+    listings = _worker_scraper.parse_page(BeautifulSoup(body, 'html.parser'))
+    return entry['url'], entry.get('page'), listings or []
+
+
+def reparse_archive(root='page_archive', workers=None, latest_only=True):
+    """Re-parse archived pages in parallel; returns (entry url, page, listings) tuples"""
+    entries = PageArchive(root).entries()
+    if latest_only:
+        # Keep only the most recent capture of each URL
+        latest = {}
+        for entry in entries:
+            latest[entry['url']] = entry
+        entries = list(latest.values())
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_reparse_worker,
+                             initargs=(root,)) as executor:
+        return list(executor.map(reparse_entry, entries, chunksize=8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive of raw OLX result pages")
+    parser.add_argument('--root', default='page_archive')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help='show archive size')
+    reparse_parser = commands.add_parser('reparse', help='re-run extraction over archived pages')
+    reparse_parser.add_argument('--workers', type=int)
+    reparse_parser.add_argument('--all-captures', action='store_true',
+                                help='parse every capture, not just the latest per URL')
+    reparse_parser.add_argument('--out', default='reparsed_results.json')
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        entries = PageArchive(args.root).entries()
+        raw = sum(entry['size'] for entry in entries)
+        stored = sum(entry['length'] for entry in entries)
+        print(f"🗄️  {len(entries)} pages, {len({entry['url'] for entry in entries})} distinct URLs")
+        if entries:
+            print(f"   📦 {raw / 1024 / 1024:.1f} MB raw, {stored / 1024 / 1024:.1f} MB stored "
+                  f"({raw / stored:.1f}x)")
+        return
+
+    start_time = time.time()
+    results = reparse_archive(args.root, args.workers, latest_only=not args.all_captures)
+    elapsed = time.time() - start_time
+
+    listings = [listing for _, _, page_listings in results for listing in page_listings]
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump({
+            'reparsed_at': datetime.now().isoformat(),
+            'pages': len(results),
+            'total_results': len(listings),
+            'listings': listings,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"♻️  Re-parsed {len(results)} pages into {len(listings)} listings in {elapsed:.1f}s")
+    print(f"💾 Results saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
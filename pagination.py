@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Page-count discovery for OLX search results
+Reads the total result count from the embedded window.__APP state
+(collectionMetadata ... "total":N with size=M in the search key), falling
+back to the highest ?page=N link in the pagination markup, so the
+scrapers can plan every page URL up front instead of guessing max_pages.
+"""
+
+import math
+import re
+
+COLLECTION_PATTERN = re.compile(r'"collectionMetadata":\{"([^"]*)":\{"total":(\d+)')
+PAGE_SIZE_PATTERN = re.compile(r'[?&#]size=(\d+)')
+PAGE_LINK_PATTERN = re.compile(r'href="[^"]*[?&]page=(\d+)')
+
+DEFAULT_PAGE_SIZE = 40
+
+
+def total_from_state(html):
+    """(total results, page size) from the embedded app state, or None"""
+    match = COLLECTION_PATTERN.search(html)
+    if not match:
+        return None
+    size_match = PAGE_SIZE_PATTERN.search(match.group(1))
+    page_size = int(size_match.group(1)) if size_match else DEFAULT_PAGE_SIZE
+    return int(match.group(2)), page_size
+
+
+def last_page_from_links(html):
+    """Highest page number linked from the page, or None"""
+    pages = [int(page) for page in PAGE_LINK_PATTERN.findall(html)]
+    return max(pages) if pages else None
+
+
+def discover_page_count(html):
+    """Number of result pages for a search, or None if it cannot be told"""
+    state = total_from_state(html)
+    if state:
+        total, page_size = state
+        return max(1, math.ceil(total / page_size))
+    return last_page_from_links(html)
+
+
+def plan_pages(discovered_pages, max_pages=None, fallback_pages=2):
+    """Page numbers to fetch after the first one
+
+    Uses the discovered count, capped by max_pages when one was given;
+    without a discovered count, falls back to max_pages or fallback_pages.
+    """
+    if discovered_pages is None:
+        last_page = max_pages or fallback_pages
+    elif max_pages:
+        last_page = min(discovered_pages, max_pages)
+    else:
+        last_page = discovered_pages
+    return list(range(2, last_page + 1))
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Relevance scoring for OLX search results
+Scores each listing against the search query using IDF-weighted title
+token matches and a per-category prior learned from earlier listings
+(category slug parsed from the item URL), so junk hits such as flats
+"with covered car parking" can be dropped before they are stored.
+"""
+
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+
+CATEGORY_PATTERN = re.compile(r'/item/(.+?)-c\d+-')
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lowercase word tokens with a light plural strip (covers -> cover)"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def category_slug(url):
+    """Category slug from an item URL, e.g. 'spare-parts'"""
+    match = CATEGORY_PATTERN.search(url or '')
+    return match.group(1) if match else 'unknown'
+
+
+class RelevanceScorer:
+    def __init__(self, query='car cover', threshold=0.25, state_file='relevance_index.json'):
+        self.query = query
+        self.query_tokens = tokenize(query)
+        self.query_bigrams = set(zip(self.query_tokens, self.query_tokens[1:]))
+        self.threshold = threshold
+        self.state_file = state_file
+        self.total_docs = 0
+        self.doc_freq = {token: 0 for token in self.query_tokens}
+        self.category_counts = {}
+        self.load_state()
+        self.refresh_weights()
+
+    def load_state(self):
+        """Load document and category counts from earlier runs"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f).get(self.query, {})
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable relevance index {self.state_file}: {e}")
+            return
+        self.total_docs = state.get('total_docs', 0)
+        self.doc_freq.update(state.get('doc_freq', {}))
+        self.category_counts = state.get('category_counts', {})
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        states = {}
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    states = json.load(f)
+            except (OSError, ValueError):
+                states = {}
+        states[self.query] = {
+            'total_docs': self.total_docs,
+            'doc_freq': self.doc_freq,
+            'category_counts': self.category_counts,
+        }
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(states, f, indent=2)
+
+    def refresh_weights(self):
+        """Precompute IDF weights for query tokens and category priors"""
+        self.idf = {
+            token: math.log((self.total_docs + 1) / (self.doc_freq.get(token, 0) + 1)) + 1
+            for token in self.query_tokens
+        }
+        self.idf_total = sum(self.idf.values()) or 1.0
+        # Laplace-smoothed share of listings in a category that carry the full query
+        self.category_prior = {
+            category: (hits + 1) / (seen + 2)
+            for category, (hits, seen) in self.category_counts.items()
+        }
+
+    def title_score(self, tokens):
+        """IDF-weighted share of query tokens present, full marks only for the phrase"""
+        token_set = set(tokens)
+        matched = sum(self.idf[token] for token in self.query_tokens if token in token_set)
+        score = matched / self.idf_total
+        if self.query_bigrams and not self.query_bigrams.intersection(zip(tokens, tokens[1:])):
+            score *= 0.8
+        return score
+
+    def score(self, listing):
+        tokens = tokenize(listing.get('title', ''))
+        category = category_slug(listing.get('url', ''))
+        return self.title_score(tokens) * self.category_prior.get(category, 0.5)
+
+    def observe(self, listings):
+        """Update document and category counts with a page of listings"""
+        for listing in listings:
+            tokens = tokenize(listing.get('title', ''))
+            token_set = set(tokens)
+            self.total_docs += 1
+            for token in self.query_tokens:
+                if token in token_set:
+                    self.doc_freq[token] += 1
+            category = category_slug(listing.get('url', ''))
+            hits, seen = self.category_counts.get(category, (0, 0))
+            has_query = all(token in token_set for token in self.query_tokens)
+            self.category_counts[category] = (hits + has_query, seen + 1)
+        self.refresh_weights()
+
+    def filter_page(self, listings):
+        """Score a page, learn from it and return the relevant listings ranked
+
+        Each listing gets a 'relevance' score; listings under the threshold
+        are dropped.
+        """
+        for listing in listings:
+            listing['relevance'] = round(self.score(listing), 3)
+        self.observe(listings)
+        self.save_state()
+        relevant = [listing for listing in listings if listing['relevance'] >= self.threshold]
+        return sorted(relevant, key=lambda listing: listing['relevance'], reverse=True)
+
+
+def benchmark(listings, count=1000000):
+    """Time scoring of `count` synthetic listings sampled from real ones"""
+    rng = random.Random(0)
+    sample = [rng.choice(listings) for _ in range(count)]
+    scorer = RelevanceScorer(state_file=None)
+    scorer.observe(listings)
+
+    start_time = time.time()
+    kept = sum(1 for listing in sample if scorer.score(listing) >= scorer.threshold)
+    elapsed = time.time() - start_time
+    print(f"⚡ Scored {count:,} listings in {elapsed:.2f}s ({count / elapsed:,.0f} listings/s)")
+    print(f"   ✅ Kept {kept:,} ({kept / count:.1%}) above threshold {scorer.threshold}")
+
+
+def main():
+    results_file = sys.argv[1] if len(sys.argv) > 1 else 'olx_car_cover_results.json'
+    with open(results_file, 'r', encoding='utf-8') as f:
+        listings = json.load(f).get('listings', [])
+
+    if '--benchmark' in sys.argv:
+        benchmark(listings)
+        return
+
+    scorer = RelevanceScorer(state_file=None)
+    scorer.observe(listings)
+    for listing in listings:
+        listing['relevance'] = scorer.score(listing)
+    ranked = sorted(listings, key=lambda listing: listing['relevance'], reverse=True)
+    kept = [listing for listing in ranked if listing['relevance'] >= scorer.threshold]
+    print(f"🎯 {len(kept)} of {len(listings)} listings are relevant to '{scorer.query}'")
+    for listing in ranked:
+        marker = '✅' if listing['relevance'] >= scorer.threshold else '❌'
+        print(f"   {marker} {listing['relevance']:.2f}  {listing['title'][:70]}")
+
+
+if __name__ == "__main__":
+    main()
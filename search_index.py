@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Local full-text search over scraped listings
+Listings are kept in a SQLite database with an FTS5 index over title and
+location, updated once per scraped page. Supports prefix (cov*) and
+phrase ("car cover") queries plus price and location filters.
+
+Usage:
+    python search_index.py "car cover" --max-price 1500 --location chennai
+    python search_index.py --add olx_car_cover_results.json
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from datetime import datetime
+
+from listing_utils import item_id, parse_price
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    id INTEGER PRIMARY KEY,
+    item_id TEXT UNIQUE,
+    title TEXT,
+    price TEXT,
+    price_value INTEGER,
+    location TEXT,
+    date TEXT,
+    url TEXT,
+    image_url TEXT,
+    indexed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_listings_price ON listings (price_value);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+    title, location, content='listings', content_rowid='id'
+);
+
+-- Keep the FTS index in sync with the listings table
+CREATE TRIGGER IF NOT EXISTS listings_ai AFTER INSERT ON listings BEGIN
+    INSERT INTO listings_fts (rowid, title, location) VALUES (new.id, new.title, new.location);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_ad AFTER DELETE ON listings BEGIN
+    INSERT INTO listings_fts (listings_fts, rowid, title, location)
+    VALUES ('delete', old.id, old.title, old.location);
+END;
+CREATE TRIGGER IF NOT EXISTS listings_au AFTER UPDATE ON listings BEGIN
+    INSERT INTO listings_fts (listings_fts, rowid, title, location)
+    VALUES ('delete', old.id, old.title, old.location);
+    INSERT INTO listings_fts (rowid, title, location) VALUES (new.id, new.title, new.location);
+END;
+"""
+
+
+def location_filter(location):
+    """FTS5 column filter matching every word of a location"""
+    words = ['"' + word.replace('"', '""') + '"' for word in location.split()]
+    return 'location : (' + ' AND '.join(words) + ')'
+
+
+class SearchIndex:
+    def __init__(self, db_path='listings_index.db'):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def add_page(self, listings):
+        """Insert or update a page of listings in a single transaction"""
+        indexed_at = datetime.now().isoformat()
+        rows = [
+            (item_id(listing), listing.get('title', 'N/A'), listing.get('price', 'N/A'),
+             parse_price(listing.get('price')), listing.get('location', 'N/A'),
+             listing.get('date', 'N/A'), listing.get('url', 'N/A'),
+             listing.get('image_url', 'N/A'), indexed_at)
+            for listing in listings
+        ]
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO listings
+                    (item_id, title, price, price_value, location, date, url, image_url, indexed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (item_id) DO UPDATE SET
+                    title = excluded.title, price = excluded.price,
+                    price_value = excluded.price_value, location = excluded.location,
+                    date = excluded.date, url = excluded.url,
+                    image_url = excluded.image_url, indexed_at = excluded.indexed_at
+            """, rows)
+        return len(rows)
+
+    def search(self, query=None, min_price=None, max_price=None, location=None, limit=20):
+        """Search listings; query uses FTS5 syntax (prefix*, "phrases", OR, NOT)"""
+        match_terms = []
+        if query:
+            match_terms.append(f"({query})")
+        if location:
+            match_terms.append(location_filter(location))
+
+        conditions = []
+        params = []
+        if match_terms:
+            sql = """
+                SELECT listings.* FROM listings_fts
+                JOIN listings ON listings.id = listings_fts.rowid
+                WHERE listings_fts MATCH ?
+            """
+            params.append(' AND '.join(match_terms))
+            order = "ORDER BY listings_fts.rank"
+        else:
+            sql = "SELECT listings.* FROM listings WHERE 1 = 1"
+            order = "ORDER BY listings.id DESC"
+        if min_price is not None:
+            conditions.append("listings.price_value >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append("listings.price_value <= ?")
+            params.append(max_price)
+        for condition in conditions:
+            sql += f" AND {condition}"
+        sql += f" {order} LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search scraped OLX listings")
+    parser.add_argument('query', nargs='?', help='FTS5 query, e.g. cov* or "car cover"')
+    parser.add_argument('--min-price', type=int)
+    parser.add_argument('--max-price', type=int)
+    parser.add_argument('--location')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--db', default='listings_index.db')
+    parser.add_argument('--add', metavar='RESULTS_JSON', help='index a saved results file')
+    args = parser.parse_args()
+
+    index = SearchIndex(args.db)
+    if args.add:
+        with open(args.add, 'r', encoding='utf-8') as f:
+            listings = json.load(f).get('listings', [])
+        index.add_page(listings)
+        print(f"💾 Indexed {len(listings)} listings ({index.count()} total)")
+        if not (args.query or args.location or args.min_price or args.max_price):
+            return
+
+    start_time = time.time()
+    try:
+        results = index.search(args.query, args.min_price, args.max_price, args.location, args.limit)
+    except sqlite3.OperationalError as e:
+        print(f"❌ Invalid query: {e}")
+        return
+    elapsed_ms = (time.time() - start_time) * 1000
+
+    print(f"🔍 {len(results)} results in {elapsed_ms:.1f} ms")
+    for listing in results:
+        print(f"\n{listing['title']}")
+        print(f"   💰 Price: {listing['price']}")
+        print(f"   📍 Location: {listing['location']}")
+        print(f"   🔗 URL: {listing['url'][:80]}...")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
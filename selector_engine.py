@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Self-healing selector engine for OLX listing pages
+Remembers which selector found the listing cards per site/page type,
+tries that one first next time and falls back to a structural search
+for repeated listing cards when every known selector misses.
+"""
+
+import json
+import os
+import re
+from urllib.parse import urlparse
+
+# Known listing-card selectors, in the order the scrapers used to try them.
+# Names are used as keys in the on-disk cache, so keep them stable.
+DEFAULT_SELECTORS = [
+    ('itemBox-div', 'div', {'data-aut-id': 'itemBox'}),
+    ('itemBox-li', 'li', {'data-aut-id': re.compile(r'^itemBox')}),
+    ('class-EIR5N', 'div', {'class': lambda x: x and 'EIR5N' in str(x)}),
+    ('class-_1ONrY', 'div', {'class': lambda x: x and '_1ONrY' in str(x)}),
+    ('class-item', 'div', {'class': lambda x: x and 'item' in str(x).lower()}),
+    ('article', 'article', {}),
+]
+
+STRUCTURAL_PREFIX = 'structural:'
+
+
+def element_signature(element):
+    """Tag name plus sorted class list, e.g. 'li._1DNjI'"""
+    classes = element.get('class') or []
+    return '.'.join([element.name] + sorted(classes))
+
+
+def structural_matcher(parent_signature, signature):
+    """find_all() filter matching a learned structural card selector"""
+    def matches(element):
+        return (element_signature(element) == signature
+                and element.parent is not None
+                and element_signature(element.parent) == parent_signature)
+    return matches
+
+
+class SelectorEngine:
+    def __init__(self, cache_file='selector_cache.json', selectors=None, min_cards=3,
+                 read_only=False):
+        self.cache_file = cache_file
+        # Read-only engines use the learned rankings but never write them back
+        self.read_only = read_only
+        self.selectors = list(DEFAULT_SELECTORS if selectors is None else selectors)
+        self.min_cards = min_cards
+        self.cache = self.load_cache()
+
+    def load_cache(self):
+        """Load learned selector rankings from disk"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Ignoring unreadable selector cache {self.cache_file}: {e}")
+            return {}
+
+    def save_cache(self):
+        """Persist learned selector rankings to disk"""
+        if not self.cache_file or self.read_only:
+            return
+        # Write-then-rename so concurrent workers never read a partial file
+        tmp_file = f"{self.cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, indent=2)
+        os.replace(tmp_file, self.cache_file)
+
+    def cache_key(self, site, page_type):
+        host = urlparse(site).netloc or site
+        return f"{host}|{page_type}"
+
+    def ranked_selectors(self, key):
+        """Known selectors ordered by past hits, learned structural ones included"""
+        entry = self.cache.get(key, {})
+        hits = entry.get('hits', {})
+        candidates = [(name, tag, attrs) for name, tag, attrs in self.selectors]
+        for name, (parent_signature, signature) in entry.get('learned', {}).items():
+            candidates.append((name, structural_matcher(parent_signature, signature), {}))
+        # Stable sort keeps the default cascade order for selectors without hits
+        return sorted(candidates, key=lambda c: -hits.get(c[0], 0))
+
+    def record_hit(self, key, name, learned=None):
+        entry = self.cache.setdefault(key, {'hits': {}, 'learned': {}})
+        entry['hits'][name] = entry['hits'].get(name, 0) + 1
+        if learned:
+            entry['learned'][name] = learned
+        # Demote everything else so a dead selector stops being tried first
+        for other in list(entry['hits']):
+            if other != name and entry['hits'][other] > 0:
+                entry['hits'][other] -= 1
+            if other != name and entry['hits'][other] == 0 and other in entry['learned']:
+                # Learned selectors are tied to obfuscated class names that
+                # change; once one decays to 0 it is forgotten, not kept around
+                # to cost a full-DOM scan on every miss
+                del entry['learned'][other]
+                del entry['hits'][other]
+        self.save_cache()
+
+    def find_listings(self, soup, site, page_type='search'):
+        """Return (listing elements, selector name) for a parsed page"""
+        key = self.cache_key(site, page_type)
+
+        for name, tag, attrs in self.ranked_selectors(key):
+            listings = soup.find_all(tag, attrs)
+            if listings:
+                self.record_hit(key, name)
+                return listings, name
+
+        listings, signatures = self.find_repeated_cards(soup)
+        if listings:
+            name = STRUCTURAL_PREFIX + ' > '.join(signatures)
+            self.record_hit(key, name, learned=list(signatures))
+            return listings, name
+
+        return [], None
+
+    def find_repeated_cards(self, soup):
+        """Locate repeated sibling elements that each wrap an /item/ link
+
+        Every item link is walked up to the root once; ancestors are grouped
+        by (parent signature, own signature) and the largest group whose
+        members hold the fewest links each wins, outermost on a tie.
+        Returns (cards, (parent signature, card signature)).
+        """
+        groups = {}
+        for link in soup.find_all('a', href=True):
+            if '/item/' not in link['href']:
+                continue
+            node = link
+            level = 0
+            while node.parent is not None and node.parent.name != '[document]':
+                group_key = (element_signature(node.parent), element_signature(node))
+                members = groups.setdefault(group_key, {'level': level, 'cards': {}})
+                members['cards'].setdefault(id(node), [node, 0])[1] += 1
+                node = node.parent
+                level += 1
+
+        best = None
+        best_score = None
+        for group_key, members in groups.items():
+            cards = members['cards']
+            if len(cards) < self.min_cards:
+                continue
+            links_per_card = max(count for _, count in cards.values())
+            score = (len(cards), -links_per_card, members['level'])
+            if best_score is None or score > best_score:
+                best, best_score = (group_key, cards), score
+
+        if not best:
+            return [], None
+        group_key, cards = best
+        return [node for node, _ in cards.values()], group_key